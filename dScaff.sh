@@ -123,10 +123,9 @@ mkdir $subdir
 
 echo "Selecting genes for each chromosome ..."
 echo " "
-cat chromosomes.txt | while read line 
-do 
-awk -v line=$line -F "\t" '{if ($4 == line) print $0}' $dataset > ./$subdir/$line.tsv
-done
+# single pass over the dataset grouped by chromosome (stable sort keeps the
+# gene order), each table is closed before the next one is opened
+tail -n +2 $dataset | LC_ALL=C sort -s -t "$(printf '\t')" -k4,4 | awk -v dir=$subdir -F "\t" '$4 != "" {if ($4 != chr) {close(out); chr = $4; out = "./"dir"/"chr".tsv"}; print > out}'
 
 mv chromosomes.txt $subdir
 
@@ -135,7 +134,11 @@ echo "Filtering genes datasets ..."
 echo " "
 cp gene_filtering.R $subdir
 cd $subdir
-Rscript gene_filtering.R
+if ! Rscript gene_filtering.R; then
+    echo "Error: Gene filtering failed."
+    echo " "
+    exit 1
+fi
 
  
 
@@ -153,6 +156,10 @@ cd assembly_database
 makeblastdb -in *.fasta -dbtype nucl
 cd $CWD/$subdir/
 
+# reference gene headers and thread count are shared by all chromosomes
+grep ">" $genes | sed 's/>//g' > headers_list_db.txt
+threads=$(nproc --all)
+
 echo "Performing BLAST for selected genes ..."
 echo " "
 ls -d ./*/ | while read line
@@ -167,36 +174,31 @@ echo "Entered " $line
 awk -F "," 'NR > 1 {print $2":"$3"-"$4}' *_filtered.csv > gene_headers.txt
 sed -i 's/"//g' gene_headers.txt
 
-cd $CWD/$subdir
-grep ">" $genes | sed 's/>//g' > headers_list_db.txt
-
-cd $line
-cat gene_headers.txt | while read gene; do grep $gene ../headers_list_db.txt >> gene_headers_db.txt; done
+# all gene ids are given to one grep as fixed strings
+grep -F -f gene_headers.txt ../headers_list_db.txt > gene_headers_db.txt
 
 
 seqtk subseq $genes gene_headers_db.txt > genes_of_interest.fasta
 
 mkdir genes
 
-awk -F ">| " '/^>/ {s=$2".gene.fasta"}; {print > s}' genes_of_interest.fasta
+# single blastn run for all genes of the chromosome, qlen gives the gene length
+blastn -db $CWD/assembly_database/*.fasta -query genes_of_interest.fasta -out genes_of_interest.lucru.csv -outfmt "6 std qlen" -num_threads $threads
 
-mv *.gene.fasta ./genes
+# split the hits in one table per gene, blastn reports them grouped by query;
+# a table is emptied only the first time its gene is seen, so a query id that
+# comes back in a later block (duplicated id in the genes file) is appended
+awk -F "\t" '$1 != gene {close(out); gene = $1; out = "genes/"gene".csv"; if (!(gene in seen)) {seen[gene] = 1; printf "" > out; close(out)}} {print >> out}' genes_of_interest.lucru.csv
 
-threads=$(nproc --all)
-
-
-for i in genes/*.gene.fasta; do blastn -db $CWD/assembly_database/*.fasta -query $i -out ${i%.gene.fasta}".lucru.csv" -outfmt 6 -num_threads $threads; done
-
-for i in genes/*.gene.fasta; do lung=$( echo $i | sed -e '1d' $i | wc -c ); length=$( expr $lung - 1 ); awk -v Length=$length -F "\t" '{ FS = OFS = "\t" } {print $0,Length}' ${i%.gene.fasta}".lucru.csv" > ${i%.gene.fasta}".csv"; done
-
-rm -r genes/*.gene.fasta genes/*.lucru.csv
+rm genes_of_interest.lucru.csv
 
 
 cd $CWD/$subdir
-rm headers_list_db.txt
 
 done
 
+rm headers_list_db.txt
+
 
 
 ###
@@ -216,7 +218,7 @@ cd $CWD/$subdir/$line
 mv *_distances_filtered.csv genes_filtered.csv
 
 cd genes
-find . -name '*' -size 0 -print0 | xargs -0 rm 2> /dev/null
+find . -type f -size 0 -delete
 
 
 done
@@ -225,7 +227,14 @@ cd $CWD
 cp contigs_mapping.R $subdir
 cd $subdir
 
-Rscript contigs_mapping.R 2> /dev/null
+# R messages are kept out of the terminal and only shown if the mapping fails
+if ! Rscript contigs_mapping.R 2> contigs_mapping.log; then
+    echo "Error: Contigs mapping failed."
+    cat contigs_mapping.log
+    echo " "
+    exit 1
+fi
+rm contigs_mapping.log
 
 ls -d ./*/ | while read line
 do